@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Header, HTTPException, Request, Response, Depends, Cookie
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional
+import asyncio
+import hashlib
 import os
+import time
+import urllib.parse
+import httpx
+import orjson
+from cachetools import TTLCache
 from keycloak import KeycloakOpenID
 from jose import jwt, JWTError
 
-app = FastAPI(title="LymphHub Backend")
+app = FastAPI(title="LymphHub Backend", default_response_class=ORJSONResponse)
 
 # Configuration
 KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "https://auth.lyckabc.xyz")
@@ -16,6 +24,17 @@ KEYCLOAK_CLIENT_SECRET = os.getenv("KEYCLOAK_CLIENT_SECRET", "change-me")
 LYMPHHUB_PUBLIC_URL = os.getenv("LYMPHHUB_PUBLIC_URL", "https://lymphhub.lyckabc.xyz")
 COOKIE_DOMAIN = os.getenv("COOKIE_DOMAIN", ".lyckabc.xyz")
 
+# JWT validation config, computed once at import time rather than per request
+ALLOWED_ALGS = ["RS256"]
+EXPECTED_AUD = KEYCLOAK_CLIENT_ID
+EXPECTED_ISS = f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}"
+# exp/aud/iss must be present, not just valid-if-present
+DECODE_OPTIONS = {"require_exp": True, "require_aud": True, "require_iss": True}
+
+# Keycloak OIDC endpoints (fixed layout under the realm issuer)
+TOKEN_ENDPOINT = f"{EXPECTED_ISS}/protocol/openid-connect/token"
+USERINFO_ENDPOINT = f"{EXPECTED_ISS}/protocol/openid-connect/userinfo"
+
 # Initialize Keycloak Client
 keycloak_openid = KeycloakOpenID(
     server_url=KEYCLOAK_URL,
@@ -31,28 +50,153 @@ class Service(BaseModel):
     description: str
     icon: str
 
+# One pooled HTTP/2 client shared by all Keycloak traffic (token exchange,
+# userinfo, JWKS). python-keycloak's per-call requests.Session would open
+# fresh TLS/TCP state and block the event loop; this client does neither.
+# Registered first so later startup hooks (JWKS load) can use it.
+@app.on_event("startup")
+async def create_http_client():
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=5,
+        limits=httpx.Limits(max_keepalive_connections=50),
+    )
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+
+
+# Realm JWKS, fetched once at startup and refreshed in the background so
+# forward_auth can verify signatures locally instead of round-tripping to
+# Keycloak's /userinfo on every request. Keys rotate on the order of months,
+# so a periodic refresh (honoring Cache-Control/ETag) is plenty.
+JWKS_URL = f"{KEYCLOAK_URL}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/certs"
+JWKS_REFRESH_INTERVAL = 3600  # fallback when Keycloak sends no Cache-Control max-age
+
+_jwks_keys: dict = {}  # kid -> JWK dict
+_jwks_etag: Optional[str] = None
+_jwks_lock = asyncio.Lock()  # single-flight: one refresh at a time
+
+
+async def _fetch_jwks():
+    """
+    GET the realm JWKS, honoring ETag.
+    Returns (keys, max_age); keys is None on a 304 Not Modified.
+    """
+    global _jwks_etag
+    headers = {}
+    if _jwks_etag:
+        headers["If-None-Match"] = _jwks_etag
+    resp = await app.state.http.get(JWKS_URL, headers=headers)
+    max_age = JWKS_REFRESH_INTERVAL
+    for directive in resp.headers.get("Cache-Control", "").split(","):
+        directive = directive.strip()
+        if directive.startswith("max-age="):
+            try:
+                max_age = int(directive.split("=", 1)[1])
+            except ValueError:
+                pass
+    if resp.status_code == 304:
+        return None, max_age
+    resp.raise_for_status()
+    _jwks_etag = resp.headers.get("ETag")
+    keys = {k["kid"]: k for k in resp.json().get("keys", []) if "kid" in k}
+    return keys, max_age
+
+
+async def _refresh_jwks() -> float:
+    """Refresh the kid -> JWK map. Keeps stale keys on error (stale-while-error)."""
+    global _jwks_keys
+    async with _jwks_lock:
+        try:
+            keys, max_age = await _fetch_jwks()
+            if keys is not None:
+                _jwks_keys = keys
+            return max_age
+        except Exception as e:
+            print(f"JWKS refresh failed, keeping cached keys: {e}")
+            return JWKS_REFRESH_INTERVAL
+
+
+async def _jwks_refresher(max_age: float):
+    """Background task: keep the JWKS fresh for the lifetime of the process."""
+    while True:
+        await asyncio.sleep(max(max_age, 60))
+        max_age = await _refresh_jwks()
+
+
+@app.on_event("startup")
+async def load_jwks():
+    max_age = await _refresh_jwks()
+    asyncio.create_task(_jwks_refresher(max_age))
+
+
+# Static portion of the Keycloak login URL. auth_url() rebuilds the URL (and
+# can touch the well-known document) on every call, so build it once at
+# startup and only append the per-request state parameter.
+LOGIN_URL_PREFIX = ""
+
+
+def _build_login_url_prefix() -> str:
+    url = keycloak_openid.auth_url(
+        redirect_uri=f"{LYMPHHUB_PUBLIC_URL}/api/callback",
+        scope="openid email profile",
+    )
+    # Drop any state/nonce the library appends; state is added per request
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query) if k not in ("state", "nonce")]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+@app.on_event("startup")
+async def build_login_url():
+    global LOGIN_URL_PREFIX
+    LOGIN_URL_PREFIX = await run_in_threadpool(_build_login_url_prefix)
+
+
+# Cache of validated tokens so repeat forward-auth hits (one per asset/API
+# request behind Traefik) skip signature verification / userinfo round-trips.
+# Keyed by SHA-256 of the token (never the raw token, to avoid leaking it via
+# memory dumps). TTL is capped at 60s; entries whose token "exp" has passed
+# are dropped earlier. Failed validations are never cached.
+_token_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# Negative cache: tokens that just failed validation. A replayed bad token
+# then costs one dict lookup instead of an RSA verify. Only the rejection
+# decision is cached (never the payload), and only briefly.
+_bad_tokens = TTLCache(maxsize=10_000, ttl=10)
+
 SERVICES = [
     Service(id="plane", name="Plane", url="https://todo.lyckabc.xyz", description="Project Management", icon="✈️"),
     Service(id="keycloak", name="Keycloak", url="https://auth.lyckabc.xyz", description="Identity Provider", icon="🔐"),
     Service(id="pgadmin", name="pgAdmin", url="https://pgadmin.lyckabc.xyz", description="Database Management", icon="🐘"),
 ]
 
+# SERVICES is constant, so serialize it exactly once at import time instead of
+# re-running Pydantic validation + JSON encoding on every request
+_SERVICES_JSON = orjson.dumps([s.model_dump() for s in SERVICES])
+_SERVICES_RESPONSE = Response(content=_SERVICES_JSON, media_type="application/json")
+
 @app.get("/api/health")
 def health_check():
     return {"status": "ok"}
 
 @app.get("/api/auth")
-async def forward_auth(
-    request: Request,
-    lymphhub_session: Optional[str] = Cookie(None)
-):
+async def forward_auth(request: Request):
     """
     Forward Auth Endpoint called by Traefik.
     """
+    # Read the cookie off the request directly; a declared Cookie() parameter
+    # would run FastAPI's param-resolution/validation chain on every subrequest
+    lymphhub_session = request.cookies.get("lymphhub_session")
+
+    # Browser navigation vs API call - decided once, used by both error branches
+    wants_html = "text/html" in (request.headers.get("accept") or "")
+
     if not lymphhub_session:
-        # Check if it's an API call or Browser navigation
-        accept = request.headers.get("Accept", "")
-        if "text/html" in accept:
+        if wants_html:
             # Redirect to login with original URL as state
             # X-Forwarded-Uri is set by Traefik
             original_uri = request.headers.get("X-Forwarded-Uri", "/")
@@ -60,28 +204,50 @@ async def forward_auth(
             # Construct return URL
             proto = request.headers.get("X-Forwarded-Proto", "http")
             target_url = f"{proto}://{original_host}{original_uri}" if original_host else original_uri
-            
-            login_url = keycloak_openid.auth_url(
-                redirect_uri=f"{LYMPHHUB_PUBLIC_URL}/api/callback",
-                scope="openid email profile",
-                state=target_url
-            )
+
+            login_url = f"{LOGIN_URL_PREFIX}&state={urllib.parse.quote(target_url, safe='')}"
             return RedirectResponse(login_url)
         else:
             return Response(status_code=401)
 
+    token_hash = hashlib.sha256(lymphhub_session.encode()).digest()
+    if token_hash in _bad_tokens:
+        # Token was rejected moments ago; don't pay for another verify
+        if wants_html:
+            return RedirectResponse(LOGIN_URL_PREFIX)
+        return Response(status_code=401)
+
     try:
-        # Verify Token
-        # Ideally, use keycloak_openid.decode_token which validates signature against JWKS
-        # For performance, caching JWKS is recommended.
-        # Here we do a simple introspection or decode.
-        # Introspection is safer but slower (network call).
-        # Decode is faster. Let's start with decode/verify using library.
-        
-        # Verify token options
-        options = {"verify_signature": True, "verify_aud": True, "exp": True}
-        token_info = keycloak_openid.decode_token(lymphhub_session, key=KEYCLOAK_PUBLIC_KEY, options=options) if 'KEYCLOAK_PUBLIC_KEY' in globals() else keycloak_openid.userinfo(lymphhub_session)
-        
+        # Verify Token - signature is checked locally against the cached JWKS,
+        # no network call on the hot path.
+        token_info = _token_cache.get(token_hash)
+        if token_info is not None and token_info.get("exp", float("inf")) <= time.time():
+            # Cached token outlived its own exp; drop it and re-validate
+            del _token_cache[token_hash]
+            token_info = None
+
+        if token_info is None:
+            kid = jwt.get_unverified_header(lymphhub_session).get("kid")
+            key = _jwks_keys.get(kid)
+            if key is None:
+                # Unknown kid - keys may have rotated; refresh once before rejecting
+                await _refresh_jwks()
+                key = _jwks_keys.get(kid)
+            if key is None:
+                raise JWTError(f"No JWKS key for kid {kid}")
+            # RSA verify is CPU-bound; run it off the event loop so concurrent
+            # Traefik subrequests overlap. Cache hits above never pay this hop.
+            token_info = await run_in_threadpool(
+                jwt.decode,
+                lymphhub_session,
+                key,
+                algorithms=ALLOWED_ALGS,
+                audience=EXPECTED_AUD,
+                issuer=EXPECTED_ISS,
+                options=DECODE_OPTIONS,
+            )
+            _token_cache[token_hash] = token_info
+
         # If we reach here, token is valid
         # Pass headers to upstream
         headers = {
@@ -94,31 +260,30 @@ async def forward_auth(
     except Exception as e:
         print(f"Auth failed: {e}")
         # Invalid token
-        if "text/html" in request.headers.get("Accept", ""):
-             login_url = keycloak_openid.auth_url(
-                redirect_uri=f"{LYMPHHUB_PUBLIC_URL}/api/callback",
-                scope="openid email profile"
-            )
-             return RedirectResponse(login_url)
+        _bad_tokens[token_hash] = True
+        if wants_html:
+             return RedirectResponse(LOGIN_URL_PREFIX)
         return Response(status_code=401)
 
 @app.get("/api/login")
 def login(redirect_url: str = "/"):
-    auth_url = keycloak_openid.auth_url(
-        redirect_uri=f"{LYMPHHUB_PUBLIC_URL}/api/callback",
-        scope="openid email profile",
-        state=redirect_url
-    )
-    return RedirectResponse(auth_url)
+    return RedirectResponse(f"{LOGIN_URL_PREFIX}&state={urllib.parse.quote(redirect_url, safe='')}")
 
 @app.get("/api/callback")
 async def callback(code: str, state: str = "/"):
     try:
-        token = keycloak_openid.token(
-            grant_type="authorization_code",
-            code=code,
-            redirect_uri=f"{LYMPHHUB_PUBLIC_URL}/api/callback"
+        resp = await app.state.http.post(
+            TOKEN_ENDPOINT,
+            data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": f"{LYMPHHUB_PUBLIC_URL}/api/callback",
+                "client_id": KEYCLOAK_CLIENT_ID,
+                "client_secret": KEYCLOAK_CLIENT_SECRET,
+            },
         )
+        resp.raise_for_status()
+        token = resp.json()
         access_token = token["access_token"]
         
         response = RedirectResponse(url=state)
@@ -138,15 +303,20 @@ async def callback(code: str, state: str = "/"):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/user/me")
-def get_current_user(lymphhub_session: Optional[str] = Cookie(None)):
+async def get_current_user(request: Request):
+    lymphhub_session = request.cookies.get("lymphhub_session")
     if not lymphhub_session:
          return {"authenticated": False}
     try:
-        userinfo = keycloak_openid.userinfo(lymphhub_session)
-        return {"authenticated": True, "user": userinfo}
+        resp = await app.state.http.get(
+            USERINFO_ENDPOINT,
+            headers={"Authorization": f"Bearer {lymphhub_session}"},
+        )
+        resp.raise_for_status()
+        return {"authenticated": True, "user": resp.json()}
     except:
         return {"authenticated": False}
 
-@app.get("/api/services", response_model=List[Service])
+@app.get("/api/services")
 def get_services():
-    return SERVICES
+    return _SERVICES_RESPONSE
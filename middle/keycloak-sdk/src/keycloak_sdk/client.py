@@ -4,6 +4,7 @@ Keycloak SDK client - wrapper around python-keycloak KeycloakAdmin.
 Provides reusable methods for creating clients, realms, users, etc.
 """
 
+import time
 from typing import Any, Optional
 
 from keycloak import KeycloakAdmin
@@ -27,6 +28,11 @@ class KeycloakSDK:
         """
         self._config = config or KeycloakConfig.from_env()
         self._admin: Optional[KeycloakAdmin] = None
+        # realm -> (admin, created_at). Constructing KeycloakAdmin performs a
+        # password grant, so reuse connections briefly instead of paying that
+        # round-trip on every call (create + get_secret alone would pay twice).
+        self._realm_admins: dict[str, tuple[KeycloakAdmin, float]] = {}
+        self._realm_admin_ttl = 30.0  # seconds; well under admin token lifetime
 
     def _get_admin(self, realm_name: Optional[str] = None) -> KeycloakAdmin:
         """Get or create KeycloakAdmin connection (master realm for admin ops)."""
@@ -45,8 +51,13 @@ class KeycloakSDK:
 
     def _admin_for_realm(self, realm_name: str) -> KeycloakAdmin:
         """Get KeycloakAdmin scoped to a specific realm (for realm-specific ops)."""
+        cached = self._realm_admins.get(realm_name)
+        if cached is not None:
+            admin, created_at = cached
+            if time.monotonic() - created_at < self._realm_admin_ttl:
+                return admin
         # Admin user lives in master realm; use user_realm_name for token, realm_name for API
-        return KeycloakAdmin(
+        admin = KeycloakAdmin(
             server_url=self._config.server_url.rstrip("/") + "/",
             username=self._config.admin_username,
             password=self._config.admin_password,
@@ -57,6 +68,8 @@ class KeycloakSDK:
             verify=self._config.verify_ssl,
             timeout=self._config.timeout,
         )
+        self._realm_admins[realm_name] = (admin, time.monotonic())
+        return admin
 
     # -------------------------------------------------------------------------
     # Realm methods